@@ -1,50 +1,74 @@
 import argparse
+import asyncio
 import os
 from pathlib import Path
 
 import ell
+import httpx
 from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+MAX_CONCURRENCY = 8
 
+# One client for all files, so concurrent requests reuse pooled connections
+OPENAI_CLIENT = OpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=httpx.Client(
+        limits=httpx.Limits(
+            max_keepalive_connections=MAX_CONCURRENCY,
+            max_connections=MAX_CONCURRENCY,
+        )
+    ),
+)
+
+
+# Static instructions go in the system message, so every request shares the same prompt prefix
+RULES = """
+You are a helpful assistant that rewrites a given text using simple sentences to help extract facts from it.
+Rewrite the text provided by the user for factual information extraction, following these rules:
+
+1. Do not use pronouns ("it", "they", "he", "she", etc.). Always refer to the entity
+2. Remove all commas, semicolons and colons from the extracted text.
+3. Rewrite the relationships "cofounder" as "founder", and "cofounded" as "founded".
+4. For cities, e.g. "Cupertino, California", rewrite as "Cupertino is a city in California".
+5. For states, e.g. "New York, USA", rewrite as "New York is a state in the USA".
+6. Rewrite all instances of "BlackRock" as "BlackRock Inc."
+"""
 
-def main(files: list[str]) -> None:
-    for filename in files:
-        # Read the text from a file
-        with open(filename, "r") as file:
-                text = file.read()
+
+@ell.simple(
+    model="gpt-4o-mini",
+    client=OPENAI_CLIENT,
+    temperature=0.3,
+)
+def extract(text: str):
+    return [ell.system(RULES), ell.user(text)]
+
+
+async def process(filename: str, new_path: Path, semaphore: asyncio.Semaphore) -> None:
+    async with semaphore:
+        # Read the text from a file off the event loop
+        data = await asyncio.to_thread(Path(filename).read_bytes)
+        text = data.decode("utf-8")
         assert text
 
+        # ell is synchronous, so run the LLM call in a worker thread
+        result = await asyncio.to_thread(extract, text)
 
-        @ell.simple(
-            model="gpt-4o-mini",
-            client=OpenAI(api_key=OPENAI_API_KEY),
-            temperature=0.3,
-        )
-        def extract(text: str):
-            """
-            You are a helpful assistant that rewrites a given text using simple sentencesto help extract facts from it.
-            """
-            return f"""
-                Rewrite the text for factual information extraction: {text}
+        output_path = new_path / f"{Path(filename).stem}_processed.txt"
+        await asyncio.to_thread(output_path.write_bytes, result.encode("utf-8"))
 
-                1. Do not use pronouns ("it", "they", "he", "she", etc.). Always refer to the entity
-                2. Remove all commas, semicolons and colons from the extracted text.
-                3. Rewrite the relationships "cofounder" as "founder", and "cofounded" as "founded".
-                4. For cities, e.g. "Cupertino, California", rewrite as "Cupertino is a city in California".
-                5. For states, e.g. "New York, USA", rewrite as "New York is a state in the USA".
-                6. Rewrite all instances of "BlackRock" as "BlackRock Inc."
-            """
+    print(f"Processed {filename}")
 
-        new_path = Path("../../data/blackrock/processed")
-        new_path.mkdir(parents=True, exist_ok=True)
 
-        with open(new_path/ f"{Path(filename).stem}_processed.txt", "w") as file:
-            file.write(extract(text))
+async def main(files: list[str]) -> None:
+    new_path = Path("../../data/blackrock/processed")
+    new_path.mkdir(parents=True, exist_ok=True)
 
-        print(f"Processed {filename}")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    await asyncio.gather(*[process(filename, new_path, semaphore) for filename in files])
 
 
 if __name__ == "__main__":
@@ -58,4 +82,4 @@ if __name__ == "__main__":
     else:
         files = [data_dir / args.file_name]
 
-    main(files)
+    asyncio.run(main(files))